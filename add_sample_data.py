@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 from src.main import app
 from src.models.user import db
 from src.models.message import Message, Channel
+from src.models.shard import router
 from datetime import datetime, timedelta
 import random
 
@@ -21,6 +22,13 @@ def add_sample_data():
         Message.query.delete()
         Channel.query.delete()
         db.session.commit()
+        for server_id in router.server_ids():
+            with router.session(server_id) as session:
+                session.query(Message).delete()
+                session.commit()
+        
+        # Mensagens agrupadas pelo shard do servidor
+        shard_messages = {}
         
         # Dados de exemplo
         servers = [
@@ -111,7 +119,7 @@ def add_sample_data():
                     is_bot=user["is_bot"]
                 )
                 
-                db.session.add(message)
+                shard_messages.setdefault(message.server_id, []).append(message)
                 message_id_counter += 1
         
         # Adicionar algumas mensagens com mídia (simuladas)
@@ -147,10 +155,13 @@ def add_sample_data():
                 is_bot=user["is_bot"]
             )
             
-            db.session.add(message)
+            shard_messages.setdefault(message.server_id, []).append(message)
             message_id_counter += 1
         
-        db.session.commit()
+        for server_id, messages in shard_messages.items():
+            with router.session(server_id) as session:
+                session.add_all(messages)
+                session.commit()
         print(f"Dados de exemplo adicionados com sucesso!")
         print(f"- {len(channels_data)} canais criados")
         print(f"- Aproximadamente {len(channels_data) * 25} mensagens criadas")
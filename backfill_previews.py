@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Script para gerar miniaturas e placeholders das imagens já existentes
+Percorre static/uploads e os anexos espelhados em static/media e gera as
+prévias que faltam usando o mesmo pool de processos do site.
+"""
+
+import sys
+import os
+import argparse
+from concurrent.futures import as_completed
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app  # inicializa o gerador de prévias
+from src.models.preview import previews
+from src.models.media import MediaFile
+
+DIRECTORIES = ['uploads', 'media']
+
+def backfill_previews(directories=DIRECTORIES):
+    """Gera as prévias das imagens que ainda não possuem uma"""
+
+    if not previews.enabled:
+        print("Pillow não está instalado; instale as dependências do requirements.txt")
+        return
+
+    # Em static/media só os anexos têm prévia; avatares são ignorados
+    with app.app_context():
+        prefix = app.config['MEDIA_URL_PREFIX']
+        attachments = {
+            f"{prefix}/{row.filename}"
+            for row in MediaFile.query.filter_by(kind='attachment', status='ready')
+        }
+
+    futures = {}
+    for directory in directories:
+        for url in previews.missing(directory):
+            if directory == 'media' and url not in attachments:
+                continue
+            future = previews.submit(url)
+            if future is not None:
+                futures[future] = url
+
+    print(f"{len(futures)} imagens sem prévia encontradas")
+
+    done = 0
+    failed = 0
+    for future in as_completed(futures):
+        try:
+            future.result()
+            done += 1
+        except Exception as e:
+            failed += 1
+            print(f"❌ {futures[future]}: {e}")
+
+    previews.shutdown()
+    print(f"- {done} prévias geradas")
+    if failed:
+        print(f"- {failed} imagens com erro")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directories', nargs='*', default=DIRECTORIES,
+                        help='Diretórios dentro de static a percorrer')
+    args = parser.parse_args()
+    backfill_previews(args.directories)
@@ -73,10 +73,11 @@ class DiscordBackupBot(commands.Bot):
                 elif any(attachment.filename.lower().endswith(ext) for ext in ['.mp3', '.wav', '.ogg', '.m4a']):
                     message_data["message_type"] = "audio"
                 
-                # Fazer download e upload do arquivo
-                media_url = await self.upload_attachment(attachment)
-                if media_url:
-                    message_data["media_url"] = media_url
+                # O site espelha o anexo da CDN em segundo plano e guarda a
+                # cópia de forma permanente, sem baixar o arquivo aqui no
+                # event loop do bot. Outros tipos de anexo não são enviados
+                if message_data["message_type"] in ("image", "audio"):
+                    message_data["media_url"] = attachment.url
                     message_data["media_filename"] = attachment.filename
             
             # Enviar mensagem para o site de backup
@@ -119,33 +120,6 @@ class DiscordBackupBot(commands.Bot):
             print(f"❌ Erro ao verificar canal: {e}")
             return False
     
-    async def upload_attachment(self, attachment):
-        """Faz upload de um anexo para o site de backup"""
-        try:
-            # Fazer download do arquivo
-            file_data = await attachment.read()
-            
-            # Preparar dados para upload
-            data = aiohttp.FormData()
-            data.add_field('file', file_data, filename=attachment.filename)
-            
-            # Fazer upload
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{BACKUP_SITE_URL}/api/upload",
-                    data=data
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['url']
-                    else:
-                        print(f"❌ Erro no upload: {response.status}")
-                        return None
-                        
-        except Exception as e:
-            print(f"❌ Erro ao fazer upload: {e}")
-            return None
-
     @commands.command(name='backup_stats')
     async def backup_stats(self, ctx):
         """Comando para ver estatísticas do backup"""
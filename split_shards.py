@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Script para dividir um app.db existente em shards por servidor
+As mensagens são copiadas para src/database/shards/<server_id>.db e o app.db
+passa a guardar apenas o catálogo de canais/servidores.
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.models.user import db
+from src.models.message import Message, Channel
+from src.models.shard import router
+
+# Colunas copiadas para o shard. Em um shard vazio o id original é mantido
+# (continua único lá dentro), preservando cursores do /around e links por
+# data-message-id; se o shard já tem mensagens o id é regenerado
+COLUMNS = [column.name for column in Message.__table__.columns]
+COLUMNS_WITHOUT_ID = [column for column in COLUMNS if column != 'id']
+
+def split_shards(batch_size=1000, keep=False):
+    """Copia as mensagens do app.db para o shard de cada servidor"""
+
+    with app.app_context():
+        server_ids = [row.server_id for row in db.session.query(Message.server_id).distinct()]
+        print(f"{len(server_ids)} servidores encontrados no app.db")
+        known_channels = {row.discord_channel_id for row in db.session.query(Channel.discord_channel_id)}
+
+        for server_id in server_ids:
+            copied = 0
+            with router.session(server_id) as session:
+                existing = {
+                    row.discord_message_id
+                    for row in session.query(Message.discord_message_id)
+                }
+                columns = COLUMNS if not existing else COLUMNS_WITHOUT_ID
+
+                query = Message.query.filter_by(server_id=server_id).order_by(Message.id)
+                last_id = 0
+                while True:
+                    batch = query.filter(Message.id > last_id).limit(batch_size).all()
+                    if not batch:
+                        break
+                    last_id = batch[-1].id
+
+                    rows = [
+                        {column: getattr(message, column) for column in columns}
+                        for message in batch
+                        if message.discord_message_id not in existing
+                    ]
+                    if rows:
+                        session.execute(Message.__table__.insert(), rows)
+                        session.commit()
+                        existing.update(row['discord_message_id'] for row in rows)
+                        copied += len(rows)
+
+                    # Garante que todos os canais do lote estão no catálogo
+                    for message in batch:
+                        if message.channel_id not in known_channels:
+                            db.session.add(Channel(
+                                discord_channel_id=message.channel_id,
+                                name=message.channel_name,
+                                server_id=message.server_id,
+                                server_name=message.server_name
+                            ))
+                            known_channels.add(message.channel_id)
+                    db.session.commit()
+
+            print(f"- {server_id}: {copied} mensagens copiadas para {router.shard_path(server_id)}")
+
+        if not keep:
+            Message.query.delete()
+            db.session.commit()
+            print("Mensagens removidas do app.db")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Quantidade de mensagens copiadas por transação')
+    parser.add_argument('--keep', action='store_true',
+                        help='Mantém as mensagens originais no app.db')
+    args = parser.parse_args()
+    split_shards(batch_size=args.batch_size, keep=args.keep)
@@ -7,6 +7,9 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.models.message import Message, Channel
+from src.models.shard import router
+from src.models.media import MediaFile, mirror
+from src.models.preview import previews
 from src.routes.user import user_bp
 from src.routes.discord import discord_bp
 
@@ -22,7 +25,17 @@ app.register_blueprint(discord_bp, url_prefix='/api')
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Estado do espelho de mídia em um banco separado do catálogo
+app.config['SQLALCHEMY_BINDS'] = {
+    'media': f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'media.db')}"
+}
 db.init_app(app)
+# Cada servidor guarda suas mensagens em um shard próprio; o app.db vira catálogo
+router.init_app(app)
+# Avatares e anexos externos são espelhados localmente em segundo plano
+mirror.init_app(app)
+# Miniaturas das imagens são geradas em um pool de processos
+previews.init_app(app)
 with app.app_context():
     db.create_all()
 
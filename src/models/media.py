@@ -0,0 +1,400 @@
+import hashlib
+import ipaddress
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.preview import previews, IMAGE_EXTENSIONS
+from src.models.shard import _configure_sqlite
+
+AUDIO_EXTENSIONS = {'mp3', 'wav', 'ogg', 'm4a'}
+# Tipos aceitos no upload e no espelhamento; qualquer outro (html, svg...)
+# seria servido pela rota estática na origem do site
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS | AUDIO_EXTENSIONS
+# Content-Type aceito -> extensão usada quando a URL não tem uma
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'audio/mpeg': '.mp3',
+    'audio/wav': '.wav',
+    'audio/x-wav': '.wav',
+    'audio/wave': '.wav',
+    'audio/ogg': '.ogg',
+    'audio/mp4': '.m4a',
+    'audio/x-m4a': '.m4a'
+}
+
+
+class MediaFile(db.Model):
+    __tablename__ = 'media_files'
+    # Banco próprio (SQLALCHEMY_BINDS['media']): as gravações dos workers do
+    # espelho não disputam o lock de escrita do catálogo
+    __bind_key__ = 'media'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), unique=True, nullable=False)
+    sha256 = db.Column(db.String(64), index=True)
+    filename = db.Column(db.String(200))  # caminho relativo dentro de MEDIA_DIRECTORY
+    content_type = db.Column(db.String(100))
+    size = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'ready', 'failed', 'evicted'
+    kind = db.Column(db.String(20), default='avatar')  # 'avatar' (cache LRU) ou 'attachment' (permanente)
+    attempts = db.Column(db.Integer, default=0)
+    last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MediaFile {self.url}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'sha256': self.sha256,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'status': self.status,
+            'kind': self.kind,
+            'attempts': self.attempts,
+            'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class MediaMirror:
+    """Espelha avatares e anexos externos (CDN do Discord) no disco local.
+
+    Os downloads rodam em um pool de threads fora do ciclo da requisição.
+    Cada URL é baixada uma única vez e o conteúdo é deduplicado pelo hash
+    SHA-256, de forma que URLs diferentes com o mesmo arquivo compartilham
+    a mesma cópia. Só são baixadas URLs dos hosts em ``MEDIA_ALLOWED_HOSTS``
+    e que não resolvem para endereços internos.
+
+    Anexos são guardados permanentemente: as URLs assinadas da CDN expiram e
+    a cópia local passa a ser a única. Avatares formam um cache que, ao
+    passar de ``MEDIA_CACHE_MAX_BYTES``, descarta os menos acessados (LRU).
+
+    O estado fica no banco ``SQLALCHEMY_BINDS['media']`` (SQLite em WAL),
+    que precisa ser configurado antes de ``db.init_app``.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._inflight = {}  # url -> tipo pedido ('avatar' ou 'attachment')
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._cache_bytes = None  # tamanho dos avatares em disco (None = ainda não medido)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MEDIA_DIRECTORY', os.path.join(app.static_folder, 'media'))
+        app.config.setdefault('MEDIA_URL_PREFIX', '/media')
+        app.config.setdefault('MEDIA_WORKERS', 4)
+        app.config.setdefault('MEDIA_RETRIES', 3)
+        app.config.setdefault('MEDIA_RETRY_BACKOFF', 1.0)
+        app.config.setdefault('MEDIA_RETRY_FAILED_AFTER', 3600)
+        app.config.setdefault('MEDIA_TIMEOUT', 15)
+        app.config.setdefault('MEDIA_MAX_FILE_SIZE', 25 * 1024 * 1024)
+        app.config.setdefault('MEDIA_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+        app.config.setdefault('MEDIA_TOUCH_INTERVAL', 300)
+        app.config.setdefault('MEDIA_ALLOWED_HOSTS', ['cdn.discordapp.com', 'media.discordapp.net'])
+        app.config.setdefault('MEDIA_BLOCK_PRIVATE_ADDRESSES', True)
+        os.makedirs(app.config['MEDIA_DIRECTORY'], exist_ok=True)
+        with app.app_context():
+            engine = db.engines.get('media')
+        if engine is None:
+            raise RuntimeError("Configure SQLALCHEMY_BINDS['media'] antes de db.init_app")
+        event.listen(engine, 'connect', _configure_sqlite)
+        self._cache_bytes = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['MEDIA_WORKERS'],
+            thread_name_prefix='media-mirror'
+        )
+        app.extensions['media_mirror'] = self
+
+    def is_allowed(self, url):
+        """Indica se a URL é http(s) de um host em ``MEDIA_ALLOWED_HOSTS``"""
+        if not url or self.app is None:
+            return False
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return False
+        allowed = {host.lower() for host in self.app.config['MEDIA_ALLOWED_HOSTS']}
+        return parsed.hostname.lower() in allowed
+
+    def check_url(self, url):
+        """Valida a URL antes de cada conexão (inclusive redirecionamentos).
+
+        Levanta ``ValueError`` para hosts fora da lista ou que resolvem para
+        endereços de loopback, rede privada, link-local etc.
+        """
+        if not self.is_allowed(url):
+            raise ValueError(f'Host não permitido: {url}')
+        if not self.app.config['MEDIA_BLOCK_PRIVATE_ADDRESSES']:
+            return
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        try:
+            addresses = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+        except socket.gaierror as e:
+            raise ValueError(f'Host não resolvido: {parsed.hostname}') from e
+        for address in addresses:
+            ip = ipaddress.ip_address(address[4][0].split('%', 1)[0])
+            if not ip.is_global:
+                raise ValueError(f'Endereço interno bloqueado: {ip}')
+
+    def enqueue(self, url, kind='avatar'):
+        """Agenda o espelhamento de uma URL externa (ignora duplicatas)"""
+        if not self.is_allowed(url) or self._executor is None:
+            return None
+        with self._lock:
+            if url in self._inflight:
+                # Um anexo nunca é rebaixado para avatar
+                if kind == 'attachment':
+                    self._inflight[url] = kind
+                return None
+            self._inflight[url] = kind
+        return self._executor.submit(self._run, url, kind)
+
+    def resolve(self, urls, kind='avatar'):
+        """Mapeia URLs externas já espelhadas para o caminho local.
+
+        URLs ainda não espelhadas (ou removidas do cache) são agendadas e
+        continuam sendo servidas pelo endereço original até ficarem prontas.
+        """
+        remote = {url for url in urls if self.is_allowed(url)}
+        if not remote:
+            return {}
+
+        config = self.app.config
+        rows = MediaFile.query.filter(MediaFile.url.in_(remote)).all()
+        known = {row.url: row for row in rows}
+        resolved = {}
+        stale = []
+        retry_before = datetime.utcnow() - timedelta(seconds=config['MEDIA_RETRY_FAILED_AFTER'])
+        touch_before = datetime.utcnow() - timedelta(seconds=config['MEDIA_TOUCH_INTERVAL'])
+
+        for url in remote:
+            row = known.get(url)
+            if row is None or row.status == 'evicted':
+                self.enqueue(url, kind)
+            elif row.status == 'failed':
+                if row.last_accessed is None or row.last_accessed < retry_before:
+                    self.enqueue(url, kind)
+            elif row.status == 'ready' and kind == 'attachment' and row.kind != 'attachment':
+                self.enqueue(url, kind)
+            elif row.status == 'ready':
+                resolved[url] = f"{config['MEDIA_URL_PREFIX']}/{row.filename}"
+                if row.last_accessed is None or row.last_accessed < touch_before:
+                    stale.append(row.id)
+
+        # Atualiza o LRU fora da requisição
+        if stale and self._executor is not None:
+            self._executor.submit(self._touch, stale)
+        return resolved
+
+    def _run(self, url, kind):
+        try:
+            with self.app.app_context():
+                return self._mirror(url, kind)
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def _requested_kind(self, url, kind):
+        with self._lock:
+            return self._inflight.get(url, kind)
+
+    def _mirror(self, url, kind='avatar'):
+        config = self.app.config
+        row = MediaFile.query.filter_by(url=url).first()
+        if row is not None and row.status == 'ready':
+            if self._requested_kind(url, kind) == 'attachment' and row.kind != 'attachment':
+                row.kind = 'attachment'
+                db.session.commit()
+                self._submit_preview(row)
+            return row
+        if row is None:
+            row = MediaFile(url=url, status='pending', kind=kind)
+            db.session.add(row)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                row = MediaFile.query.filter_by(url=url).first()
+
+        try:
+            content, content_type = self._download(url)
+            extension = _checked_extension(url, content_type)
+        except Exception:
+            row.status = 'failed'
+            row.attempts = (row.attempts or 0) + 1
+            row.last_accessed = datetime.utcnow()
+            db.session.commit()
+            return row
+
+        # Gravação e evicção serializadas: um worker não apaga o arquivo que
+        # outro acabou de reaproveitar
+        with self._store_lock:
+            sha256 = hashlib.sha256(content).hexdigest()
+            # Conteúdo já espelhado por outra URL reaproveita o mesmo arquivo
+            duplicate = MediaFile.query.filter_by(sha256=sha256, status='ready').first()
+            if duplicate is not None:
+                filename = duplicate.filename
+            else:
+                filename = f'{sha256[:2]}/{sha256}{extension}'
+            path = os.path.join(config['MEDIA_DIRECTORY'], filename)
+
+            written = not os.path.exists(path)
+            if written:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f'{path}.{threading.get_ident()}.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+
+            row.sha256 = sha256
+            row.filename = filename
+            row.content_type = content_type
+            row.size = len(content)
+            row.status = 'ready'
+            if self._requested_kind(url, kind) == 'attachment':
+                row.kind = 'attachment'
+            row.attempts = (row.attempts or 0) + 1
+            row.last_accessed = datetime.utcnow()
+            db.session.commit()
+
+            # O total é mantido em memória; a varredura completa só roda
+            # na primeira vez e quando o cache passa do limite
+            if written and row.kind != 'attachment' and self._cache_bytes is not None:
+                self._cache_bytes += row.size
+            if self._cache_bytes is None or self._cache_bytes > config['MEDIA_CACHE_MAX_BYTES']:
+                self._evict(keep=sha256)
+
+        self._submit_preview(row)
+        return row
+
+    def _submit_preview(self, row):
+        # Só anexos ganham miniatura; avatares já são pequenos e saem do cache
+        if row.kind == 'attachment' and (row.content_type or '').startswith('image/'):
+            previews.submit(f"{self.app.config['MEDIA_URL_PREFIX']}/{row.filename}")
+
+    def _download(self, url):
+        """Baixa a URL com retentativas e backoff exponencial"""
+        config = self.app.config
+        retries = max(config['MEDIA_RETRIES'], 1)
+        max_size = config['MEDIA_MAX_FILE_SIZE']
+        request = urllib.request.Request(url, headers={'User-Agent': 'DiscordBackupMirror/1.0'})
+        opener = urllib.request.build_opener(_CheckedRedirectHandler(self))
+
+        for attempt in range(retries):
+            # Revalida a cada tentativa: o DNS pode mudar entre elas
+            self.check_url(url)
+            try:
+                with opener.open(request, timeout=config['MEDIA_TIMEOUT']) as response:
+                    content = response.read(max_size + 1)
+                    if len(content) > max_size:
+                        raise ValueError(f'Arquivo maior que {max_size} bytes: {url}')
+                    content_type = response.headers.get_content_type()
+                    return content, content_type
+            except urllib.error.HTTPError as e:
+                # Erros do cliente (exceto rate limit) não melhoram com retentativa
+                if 400 <= e.code < 500 and e.code != 429:
+                    raise
+                if attempt == retries - 1:
+                    raise
+            except (urllib.error.URLError, TimeoutError, ConnectionError):
+                if attempt == retries - 1:
+                    raise
+            time.sleep(config['MEDIA_RETRY_BACKOFF'] * (2 ** attempt))
+
+    def _touch(self, ids):
+        with self.app.app_context():
+            MediaFile.query.filter(MediaFile.id.in_(ids)).update(
+                {MediaFile.last_accessed: datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+
+    def _evict(self, keep=None):
+        """Remove os avatares menos acessados até o cache caber no limite.
+
+        Arquivos compartilhados com algum anexo nunca são removidos. Deve ser
+        chamado com ``_store_lock`` adquirido; recalcula ``_cache_bytes``.
+        """
+        config = self.app.config
+        pinned = db.session.query(MediaFile.sha256).filter(
+            MediaFile.kind == 'attachment', MediaFile.sha256.isnot(None)
+        )
+        blobs = db.session.query(
+            MediaFile.sha256,
+            MediaFile.filename,
+            db.func.max(MediaFile.size),
+            db.func.max(MediaFile.last_accessed)
+        ).filter(
+            MediaFile.status == 'ready', MediaFile.sha256.notin_(pinned)
+        ).group_by(MediaFile.sha256).order_by(
+            db.func.max(MediaFile.last_accessed).asc()
+        ).all()
+
+        total = sum(size or 0 for _, _, size, _ in blobs)
+        for sha256, filename, size, _ in blobs:
+            if total <= config['MEDIA_CACHE_MAX_BYTES']:
+                break
+            if sha256 == keep:
+                continue
+            try:
+                os.remove(os.path.join(config['MEDIA_DIRECTORY'], filename))
+            except FileNotFoundError:
+                pass
+            previews.remove(f"{config['MEDIA_URL_PREFIX']}/{filename}")
+            MediaFile.query.filter_by(sha256=sha256).update(
+                {MediaFile.status: 'evicted'}, synchronize_session=False
+            )
+            total -= size or 0
+        db.session.commit()
+        self._cache_bytes = total
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Aplica as mesmas validações de host/endereço aos redirecionamentos"""
+
+    def __init__(self, mirror):
+        super().__init__()
+        self.mirror = mirror
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.mirror.check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def _checked_extension(url, content_type):
+    """Extensão do arquivo espelhado; levanta ``ValueError`` se o tipo não é aceito"""
+    if content_type not in CONTENT_TYPE_EXTENSIONS:
+        raise ValueError(f'Tipo de conteúdo não permitido: {content_type}')
+    extension = os.path.splitext(urlparse(url).path)[1].lower() or CONTENT_TYPE_EXTENSIONS[content_type]
+    if extension[1:] not in ALLOWED_EXTENSIONS:
+        raise ValueError(f'Extensão não permitida: {url}')
+    return extension
+
+
+mirror = MediaMirror()
@@ -1,8 +1,13 @@
 from src.models.user import db
+from src.models.preview import previews, EMPTY_PREVIEW
 from datetime import datetime
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Navegação por canal em ordem cronológica (paginação e jump-to)
+        db.Index('ix_messages_channel_timestamp', 'channel_id', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     discord_message_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -25,8 +30,10 @@ class Message(db.Model):
         return f'<Message {self.discord_message_id}>'
 
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
+            # O id só é único dentro do shard; a chave vale entre servidores
+            'key': f'{self.server_id}:{self.id}',
             'discord_message_id': self.discord_message_id,
             'user_id': self.user_id,
             'username': self.username,
@@ -43,6 +50,12 @@ class Message(db.Model):
             'is_bot': self.is_bot,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        # Miniatura, placeholder e dimensões das imagens (quando já geradas)
+        if self.message_type == 'image':
+            data.update(previews.describe(self.media_url))
+        else:
+            data.update(EMPTY_PREVIEW)
+        return data
 
 class Channel(db.Model):
     __tablename__ = 'channels'
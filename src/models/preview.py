@@ -0,0 +1,212 @@
+import base64
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sem Pillow as miniaturas ficam desativadas
+    Image = None
+
+# Tipos de imagem aceitos no upload e no espelho (ver ALLOWED_EXTENSIONS)
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+EMPTY_PREVIEW = {
+    'thumbnail_url': None,
+    'placeholder': None,
+    'media_width': None,
+    'media_height': None
+}
+
+
+def generate_preview(source_path, thumbnail_path, metadata_path, thumbnail_size, placeholder_size):
+    """Gera a miniatura WebP e o placeholder borrado de uma imagem.
+
+    Roda em um processo do pool, fora da requisição. O placeholder é um JPEG
+    minúsculo em data URI, gravado junto com as dimensões em um JSON ao lado
+    da miniatura. Imagens animadas (GIF/WebP) não ganham miniatura, que
+    teria só o primeiro quadro; a lista continua usando o original.
+    """
+    with Image.open(source_path) as image:
+        animated = getattr(image, 'is_animated', False)
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+        thumbnail = None
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        if not animated:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((thumbnail_size, thumbnail_size))
+            temp_path = f'{thumbnail_path}.{os.getpid()}.tmp'
+            thumbnail.save(temp_path, 'WEBP', quality=75, method=4)
+            os.replace(temp_path, thumbnail_path)
+
+        placeholder = image.convert('RGB')
+        placeholder.thumbnail((placeholder_size, placeholder_size))
+        buffer = io.BytesIO()
+        placeholder.save(buffer, 'JPEG', quality=40)
+
+    metadata = {
+        'width': width,
+        'height': height,
+        'animated': animated,
+        'thumbnail_width': thumbnail.width if thumbnail else None,
+        'thumbnail_height': thumbnail.height if thumbnail else None,
+        'placeholder': 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    }
+    temp_path = f'{metadata_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(metadata, f)
+    os.replace(temp_path, metadata_path)
+    return metadata_path
+
+
+class PreviewGenerator:
+    """Gera miniaturas e placeholders das imagens servidas em ``static``.
+
+    A geração roda em um pool de processos (``PREVIEW_WORKERS``) para não
+    disputar o GIL com as requisições. Para ``/uploads/images/foto.png`` a
+    miniatura fica em ``/thumbs/uploads/images/foto.png.webp`` e os metadados
+    (dimensões e placeholder) em ``foto.png.json`` no mesmo diretório.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.static_folder = None
+        self._executor = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.static_folder = app.static_folder
+        app.config.setdefault('PREVIEW_URL_PREFIX', '/thumbs')
+        app.config.setdefault('PREVIEW_WORKERS', 2)
+        app.config.setdefault('PREVIEW_THUMBNAIL_SIZE', 400)
+        app.config.setdefault('PREVIEW_PLACEHOLDER_SIZE', 16)
+        app.config.setdefault('PREVIEW_CACHE_ENTRIES', 4096)
+        app.extensions['preview_generator'] = self
+
+    @property
+    def enabled(self):
+        return Image is not None and self.app is not None
+
+    def _paths(self, url):
+        """Caminhos (original, miniatura, metadados) de uma URL local"""
+        if not url or not url.startswith('/') or '..' in url.split('/'):
+            return None
+        if url.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+            return None
+        relative = url.lstrip('/')
+        prefix = self.app.config['PREVIEW_URL_PREFIX'].strip('/')
+        base = os.path.join(self.static_folder, prefix, relative)
+        return (
+            os.path.join(self.static_folder, relative),
+            f'{base}.webp',
+            f'{base}.json'
+        )
+
+    def submit(self, url):
+        """Agenda a geração da prévia de uma imagem local; retorna o Future"""
+        if not self.enabled:
+            return None
+        paths = self._paths(url)
+        if paths is None or not os.path.exists(paths[0]):
+            return None
+
+        config = self.app.config
+        with self._lock:
+            if self._executor is None:
+                # spawn: o processo já tem várias threads (mirror, shards,
+                # Werkzeug) e um fork nesse estado pode travar o filho
+                self._executor = ProcessPoolExecutor(
+                    max_workers=config['PREVIEW_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            executor = self._executor
+        future = executor.submit(
+            generate_preview, *paths,
+            config['PREVIEW_THUMBNAIL_SIZE'], config['PREVIEW_PLACEHOLDER_SIZE']
+        )
+        future.add_done_callback(partial(self._log_failure, url))
+        return future
+
+    def _log_failure(self, url, future):
+        # Imagem corrompida, bomba de descompressão etc. não passam em silêncio
+        if not future.cancelled() and future.exception() is not None:
+            self.app.logger.warning('Falha ao gerar a prévia de %s: %s', url, future.exception())
+
+    def describe(self, url):
+        """Campos de prévia de uma imagem para o ``to_dict()``"""
+        if self.app is None:
+            return dict(EMPTY_PREVIEW)
+
+        with self._lock:
+            if url in self._cache:
+                self._cache.move_to_end(url)
+                return dict(self._cache[url])
+
+        paths = self._paths(url)
+        if paths is None:
+            return dict(EMPTY_PREVIEW)
+        try:
+            with open(paths[2]) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            # Ainda não gerada: a lista usa a imagem original
+            return dict(EMPTY_PREVIEW)
+
+        preview = {
+            'thumbnail_url': None if metadata.get('animated') else f"{self.app.config['PREVIEW_URL_PREFIX']}{url}.webp",
+            'placeholder': metadata['placeholder'],
+            'media_width': metadata['width'],
+            'media_height': metadata['height']
+        }
+        with self._lock:
+            self._cache[url] = preview
+            while len(self._cache) > self.app.config['PREVIEW_CACHE_ENTRIES']:
+                self._cache.popitem(last=False)
+        return dict(preview)
+
+    def remove(self, url):
+        """Apaga a miniatura e os metadados de uma imagem"""
+        if self.app is None:
+            return
+        with self._lock:
+            self._cache.pop(url, None)
+        paths = self._paths(url)
+        if paths is None:
+            return
+        for path in paths[1:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def missing(self, directory):
+        """URLs das imagens de ``static/<directory>`` que ainda não têm prévia"""
+        root = os.path.join(self.static_folder, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                url = '/' + os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                paths = self._paths(url)
+                if paths is not None and not os.path.exists(paths[2]):
+                    yield url
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+previews = PreviewGenerator()
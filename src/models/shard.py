@@ -0,0 +1,138 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from werkzeug.utils import secure_filename
+
+from src.models.message import Message
+
+
+class ShardRouter:
+    """Roteia as mensagens de cada servidor para um arquivo SQLite próprio.
+
+    O banco principal (app.db) passa a funcionar como catálogo, guardando
+    apenas canais/servidores e usuários. Cada ``server_id`` recebe o seu
+    próprio arquivo em ``SHARD_DIRECTORY``, de forma que o lock de escrita
+    de um servidor muito ativo não bloqueia os demais.
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.max_workers = 8
+        self._engines = {}
+        self._sessionmakers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.setdefault(
+            'SHARD_DIRECTORY',
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'shards')
+        )
+        self.max_workers = app.config.setdefault('SHARD_MAX_WORKERS', 8)
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['shard_router'] = self
+
+    def shard_path(self, server_id):
+        """Caminho do arquivo SQLite de um servidor"""
+        name = secure_filename(str(server_id))
+        if not name:
+            raise ValueError(f'server_id inválido: {server_id!r}')
+        return os.path.join(self.directory, f'{name}.db')
+
+    def has_shard(self, server_id):
+        """Indica se o servidor já possui um shard em disco"""
+        try:
+            return os.path.exists(self.shard_path(server_id))
+        except ValueError:
+            return False
+
+    def engine_for(self, server_id):
+        """Retorna (criando se necessário) a engine do shard de um servidor"""
+        key = str(server_id)
+        engine = self._engines.get(key)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = create_engine(f'sqlite:///{self.shard_path(key)}')
+                event.listen(engine, 'connect', _configure_sqlite)
+                Message.__table__.create(engine, checkfirst=True)
+                # Shards antigos não recebem os índices pelo create acima
+                for index in Message.__table__.indexes:
+                    index.create(engine, checkfirst=True)
+                self._sessionmakers[key] = sessionmaker(bind=engine, expire_on_commit=False)
+                self._engines[key] = engine
+        return engine
+
+    @contextmanager
+    def session(self, server_id, create=True):
+        """Abre uma sessão no shard do servidor, fechando-a ao final.
+
+        Com ``create=False`` (leituras) um shard inexistente não é criado e
+        ``LookupError`` é levantado.
+        """
+        if not create and not self.has_shard(server_id):
+            raise LookupError(f'Shard inexistente: {server_id!r}')
+        self.engine_for(server_id)
+        session = self._sessionmakers[str(server_id)]()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def server_ids(self):
+        """Lista os servidores que já possuem shard em disco"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            filename[:-3] for filename in os.listdir(self.directory)
+            if filename.endswith('.db')
+        )
+
+    def fan_out(self, func, server_ids=None):
+        """Executa ``func(session, server_id)`` em paralelo em cada shard.
+
+        Retorna uma lista de pares ``(server_id, resultado)`` na mesma ordem
+        de ``server_ids``.
+        """
+        if server_ids is None:
+            server_ids = self.server_ids()
+        if not server_ids:
+            return []
+
+        def run(server_id):
+            with self.session(server_id, create=False) as session:
+                return server_id, func(session, server_id)
+
+        workers = min(self.max_workers, len(server_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, server_ids))
+
+    def dispose(self):
+        """Fecha todas as conexões abertas com os shards"""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+            self._sessionmakers.clear()
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL permite leituras concorrentes enquanto o bot grava no mesmo shard
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+router = ShardRouter()
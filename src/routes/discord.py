@@ -1,17 +1,79 @@
 from flask import Blueprint, jsonify, request, current_app
 from src.models.message import Message, Channel, db
-from datetime import datetime
+from src.models.shard import router
+from src.models.media import mirror, ALLOWED_EXTENSIONS
+from src.models.preview import previews, IMAGE_EXTENSIONS
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
+import math
 import os
 from werkzeug.utils import secure_filename
 
 discord_bp = Blueprint('discord', __name__)
 
-# Configurações para upload
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'mp3', 'wav', 'ogg', 'm4a'}
+# Limites da janela de navegação (jump-to)
+AROUND_DEFAULT = 25
+AROUND_MAX = 200
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def server_id_for_channel(channel_id):
+    """Descobre em qual shard estão as mensagens de um canal"""
+    server_id = request.args.get('server_id')
+    if server_id:
+        return server_id
+    channel = Channel.query.filter_by(discord_channel_id=channel_id).first()
+    return channel.server_id if channel else None
+
+def shards_for(server_id):
+    """Shards consultados: só o do servidor pedido ou todos (None)"""
+    if not server_id:
+        return None
+    return [server_id] if router.has_shard(server_id) else []
+
+def parse_timestamp(value):
+    """Converte um timestamp ISO 8601 para datetime UTC sem fuso (como é gravado)"""
+    try:
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def serialize_messages(messages):
+    """Serializa mensagens trocando avatares/anexos externos pela cópia local"""
+    items = [message.to_dict() for message in messages]
+    local = mirror.resolve([item['avatar_url'] for item in items])
+    local.update(mirror.resolve([item['media_url'] for item in items], kind='attachment'))
+    for item in items:
+        item['avatar_url'] = local.get(item['avatar_url'], item['avatar_url'])
+        if item['media_url'] in local:
+            item['media_url'] = local[item['media_url']]
+            if item['message_type'] == 'image':
+                item.update(previews.describe(item['media_url']))
+    return items
+
+def ensure_channel(data):
+    """Registra no catálogo o canal de uma mensagem, se ainda não existir"""
+    channel = Channel.query.filter_by(discord_channel_id=data['channel_id']).first()
+    if channel is None:
+        channel = Channel(
+            discord_channel_id=data['channel_id'],
+            name=data['channel_name'],
+            server_id=data['server_id'],
+            server_name=data['server_name']
+        )
+        db.session.add(channel)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição registrou o mesmo canal ao mesmo tempo
+            db.session.rollback()
+            channel = Channel.query.filter_by(discord_channel_id=data['channel_id']).first()
+    return channel
+
 @discord_bp.route('/channels', methods=['GET'])
 def get_channels():
     """Retorna lista de canais disponíveis"""
@@ -44,23 +106,107 @@ def get_messages(channel_id):
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 50, type=int)
     search = request.args.get('search', '')
+    page = max(page, 1)
+    limit = max(limit, 1)
     
-    query = Message.query.filter_by(channel_id=channel_id)
-    
-    if search:
-        query = query.filter(Message.content.contains(search))
+    server_id = server_id_for_channel(channel_id)
+    if server_id is None or not router.has_shard(server_id):
+        return jsonify({
+            'messages': [],
+            'total': 0,
+            'pages': 0,
+            'current_page': page,
+            'has_next': False,
+            'has_prev': False
+        })
     
-    messages = query.order_by(Message.timestamp.asc()).paginate(
-        page=page, per_page=limit, error_out=False
-    )
+    with router.session(server_id, create=False) as session:
+        query = session.query(Message).filter_by(channel_id=channel_id)
+        
+        if search:
+            query = query.filter(Message.content.contains(search))
+        
+        total = query.count()
+        messages = query.order_by(Message.timestamp.asc()).offset((page - 1) * limit).limit(limit).all()
     
+    pages = math.ceil(total / limit) if total else 0
     return jsonify({
-        'messages': [message.to_dict() for message in messages.items],
-        'total': messages.total,
-        'pages': messages.pages,
+        'messages': serialize_messages(messages),
+        'total': total,
+        'pages': pages,
         'current_page': page,
-        'has_next': messages.has_next,
-        'has_prev': messages.has_prev
+        'has_next': page < pages,
+        'has_prev': page > 1
+    })
+
+@discord_bp.route('/messages/<channel_id>/around', methods=['GET'])
+def get_messages_around(channel_id):
+    """Retorna uma janela de mensagens centrada em uma mensagem ou data.
+
+    O alvo pode ser ``message_id`` (id do Discord), ``timestamp`` (ISO 8601,
+    primeira mensagem a partir da data) ou ``cursor`` (devolvido por uma
+    chamada anterior, exclusivo). ``before``/``after`` definem quantas
+    mensagens trazer de cada lado.
+    """
+    before = min(max(request.args.get('before', AROUND_DEFAULT, type=int), 0), AROUND_MAX)
+    after = min(max(request.args.get('after', AROUND_DEFAULT, type=int), 0), AROUND_MAX)
+    message_id = request.args.get('message_id')
+    timestamp = request.args.get('timestamp')
+    cursor = request.args.get('cursor', type=int)
+    
+    if not (message_id or timestamp or cursor is not None):
+        return jsonify({'error': 'Informe message_id, timestamp ou cursor'}), 400
+    
+    server_id = server_id_for_channel(channel_id)
+    if server_id is None or not router.has_shard(server_id):
+        return jsonify({'error': 'Canal não encontrado'}), 404
+    
+    with router.session(server_id, create=False) as session:
+        query = session.query(Message).filter(Message.channel_id == channel_id)
+        
+        if message_id:
+            target = query.filter(Message.discord_message_id == message_id).first()
+        elif cursor is not None:
+            target = query.filter(Message.id == cursor).first()
+        else:
+            moment = parse_timestamp(timestamp)
+            if moment is None:
+                return jsonify({'error': 'timestamp inválido'}), 400
+            # Primeira mensagem a partir da data; se não houver, a última do canal
+            target = query.filter(Message.timestamp >= moment).order_by(
+                Message.timestamp.asc(), Message.id.asc()
+            ).first() or query.order_by(
+                Message.timestamp.desc(), Message.id.desc()
+            ).first()
+        
+        if target is None:
+            return jsonify({'error': 'Mensagem não encontrada'}), 404
+        
+        # Seeks pelo índice (channel_id, timestamp, id) a partir do alvo
+        older = query.filter(db.or_(
+            Message.timestamp < target.timestamp,
+            db.and_(Message.timestamp == target.timestamp, Message.id < target.id)
+        )).order_by(Message.timestamp.desc(), Message.id.desc()).limit(before + 1).all()
+        newer = query.filter(db.or_(
+            Message.timestamp > target.timestamp,
+            db.and_(Message.timestamp == target.timestamp, Message.id > target.id)
+        )).order_by(Message.timestamp.asc(), Message.id.asc()).limit(after + 1).all()
+    
+    has_before = len(older) > before
+    has_after = len(newer) > after
+    older = list(reversed(older[:before]))
+    newer = newer[:after]
+    
+    # Com cursor o alvo já está na tela do cliente e não é repetido
+    messages = older + newer if cursor is not None else older + [target] + newer
+    
+    return jsonify({
+        'messages': serialize_messages(messages),
+        'target_id': target.id,
+        'has_before': has_before,
+        'has_after': has_after,
+        'before_cursor': messages[0].id if messages else target.id,
+        'after_cursor': messages[-1].id if messages else target.id
     })
 
 @discord_bp.route('/messages', methods=['POST'])
@@ -68,10 +214,8 @@ def create_message():
     """Adiciona nova mensagem (para o bot do Discord)"""
     data = request.json
     
-    # Verifica se a mensagem já existe
-    existing_message = Message.query.filter_by(discord_message_id=data['discord_message_id']).first()
-    if existing_message:
-        return jsonify(existing_message.to_dict()), 200
+    # Garante que o catálogo sabe em qual shard está o canal
+    ensure_channel(data)
     
     # Converte timestamp se necessário
     timestamp = data.get('timestamp')
@@ -100,8 +244,19 @@ def create_message():
         is_bot=data.get('is_bot', False)
     )
     
-    db.session.add(message)
-    db.session.commit()
+    with router.session(data['server_id']) as session:
+        # Verifica se a mensagem já existe
+        existing_message = session.query(Message).filter_by(discord_message_id=data['discord_message_id']).first()
+        if existing_message:
+            return jsonify(existing_message.to_dict()), 200
+        
+        session.add(message)
+        session.commit()
+    
+    # Espelha avatar e anexo externos em segundo plano; o anexo é
+    # guardado de forma permanente antes que a URL assinada expire
+    mirror.enqueue(message.avatar_url)
+    mirror.enqueue(message.media_url, kind='attachment')
     return jsonify(message.to_dict()), 201
 
 @discord_bp.route('/upload', methods=['POST'])
@@ -119,7 +274,7 @@ def upload_file():
         
         # Determina o diretório baseado no tipo de arquivo
         file_ext = filename.rsplit('.', 1)[1].lower()
-        if file_ext in {'png', 'jpg', 'jpeg', 'gif', 'webp'}:
+        if file_ext in IMAGE_EXTENSIONS:
             upload_dir = 'images'
         else:
             upload_dir = 'audio'
@@ -134,6 +289,10 @@ def upload_file():
         
         # Retorna URL relativa
         file_url = f'/uploads/{upload_dir}/{filename}'
+        
+        # Miniatura e placeholder são gerados fora da requisição
+        if upload_dir == 'images':
+            previews.submit(file_url)
         return jsonify({
             'url': file_url,
             'filename': filename,
@@ -157,16 +316,52 @@ def get_server_channels(server_id):
     channels = Channel.query.filter_by(server_id=server_id).all()
     return jsonify([channel.to_dict() for channel in channels])
 
+@discord_bp.route('/search', methods=['GET'])
+def search_messages():
+    """Busca mensagens em um servidor ou, sem server_id, em todos os shards"""
+    search = request.args.get('q', '')
+    server_id = request.args.get('server_id')
+    limit = max(request.args.get('limit', 50, type=int), 1)
+    
+    if not search:
+        return jsonify({'error': 'Parâmetro q é obrigatório'}), 400
+    
+    def search_shard(session, shard_id):
+        return session.query(Message).filter(
+            Message.content.contains(search)
+        ).order_by(Message.timestamp.desc()).limit(limit).all()
+    
+    server_ids = shards_for(server_id)
+    messages = []
+    for _, shard_messages in router.fan_out(search_shard, server_ids):
+        messages.extend(shard_messages)
+    messages.sort(key=lambda message: message.timestamp, reverse=True)
+    
+    return jsonify({
+        'messages': serialize_messages(messages[:limit])
+    })
+
 @discord_bp.route('/stats', methods=['GET'])
 def get_stats():
-    """Retorna estatísticas gerais"""
-    total_messages = Message.query.count()
-    total_channels = Channel.query.count()
-    total_servers = db.session.query(Channel.server_id).distinct().count()
+    """Retorna estatísticas gerais (ou de um servidor, com server_id)"""
+    server_id = request.args.get('server_id')
+    
+    def count_messages(session, shard_id):
+        return session.query(Message).count()
+    
+    server_ids = shards_for(server_id)
+    total_messages = sum(count for _, count in router.fan_out(count_messages, server_ids))
+    
+    channels = Channel.query
+    servers = db.session.query(Channel.server_id).distinct()
+    if server_id:
+        channels = channels.filter_by(server_id=server_id)
+        servers = servers.filter(Channel.server_id == server_id)
+    total_channels = channels.count()
+    total_servers = servers.count()
     
     return jsonify({
         'total_messages': total_messages,
         'total_channels': total_channels,
         'total_servers': total_servers
     })
-
@@ -1,14 +1,40 @@
 // Configurações globais
 const API_BASE = '/api';
 let currentChannelId = null;
-let currentPage = 1;
 let isLoading = false;
 let searchQuery = '';
+let renderFrame = null;
+
+// Lista virtualizada de mensagens
+const PAGE_SIZE = 50;
+const JUMP_WINDOW = 25;
+const MAX_LOADED_ROWS = 300;
+const LOAD_THRESHOLD_ROWS = 20;
+const RENDER_BUFFER_PX = 800;
+const ESTIMATED_ROW_HEIGHT = 64;
+
+const virtualList = {
+    mode: 'page',        // 'page' (paginação por página) ou 'cursor' (jump-to)
+    rows: [],            // mensagens carregadas, em ordem cronológica
+    firstIndex: 0,       // posição absoluta de rows[0] no modo 'page'
+    hasBefore: false,
+    hasAfter: false,
+    evictedAbove: [],    // blocos descartados acima: {count, height}
+    evictedBelow: [],    // blocos descartados abaixo: {count, height}
+    heights: new Map(),  // cache de alturas medidas por id de mensagem
+    rendered: new Map(), // id -> nó da linha no DOM
+    pool: [],            // nós de linha livres para reciclagem
+    highlightId: null,
+    generation: 0,
+    topSpacer: null,
+    bottomSpacer: null
+};
 
 // Elementos DOM
 const elements = {
     serverList: document.getElementById('serverList'),
     channelsList: document.getElementById('textChannels'),
+    messagesContainer: document.getElementById('messagesContainer'),
     messagesList: document.getElementById('messagesList'),
     currentChannelName: document.getElementById('currentChannelName'),
     serverName: document.getElementById('serverName'),
@@ -16,6 +42,10 @@ const elements = {
     searchBar: document.getElementById('searchBar'),
     searchInput: document.getElementById('searchInput'),
     searchSubmit: document.getElementById('searchSubmit'),
+    jumpBtn: document.getElementById('jumpBtn'),
+    jumpBar: document.getElementById('jumpBar'),
+    jumpDateInput: document.getElementById('jumpDateInput'),
+    jumpSubmit: document.getElementById('jumpSubmit'),
     refreshBtn: document.getElementById('refreshBtn'),
     loading: document.getElementById('loading'),
     mediaModal: document.getElementById('mediaModal'),
@@ -42,6 +72,11 @@ function setupEventListeners() {
         }
     });
     
+    // Jump-to por data
+    elements.jumpBtn.addEventListener('click', toggleJump);
+    elements.jumpSubmit.addEventListener('click', performJump);
+    elements.jumpDateInput.addEventListener('change', performJump);
+    
     // Refresh
     elements.refreshBtn.addEventListener('click', function() {
         if (currentChannelId) {
@@ -57,8 +92,9 @@ function setupEventListeners() {
         }
     });
     
-    // Scroll infinito
-    elements.messagesList.addEventListener('scroll', handleScroll);
+    // Scroll infinito (quem rola é o container, não a lista)
+    elements.messagesContainer.addEventListener('scroll', handleScroll);
+    window.addEventListener('resize', scheduleRender);
 }
 
 // Inicializar aplicação
@@ -205,7 +241,6 @@ function selectChannel(channelId, channelName) {
     
     elements.currentChannelName.textContent = channelName;
     currentChannelId = channelId;
-    currentPage = 1;
     
     // Carregar mensagens
     loadMessages(channelId, 1, true);
@@ -213,28 +248,22 @@ function selectChannel(channelId, channelName) {
 
 // Carregar mensagens
 async function loadMessages(channelId, page = 1, clearMessages = false) {
-    if (isLoading) return;
+    // Sem limpar, continua a partir do fim da janela já carregada
+    if (!clearMessages && virtualList.rows.length) {
+        return loadAfter();
+    }
     
+    // Uma nova listagem invalida qualquer carregamento em andamento
     isLoading = true;
     elements.loading.style.display = 'flex';
+    const generation = resetVirtualList('page');
     
     try {
-        const url = new URL(`${window.location.origin}${API_BASE}/messages/${channelId}`);
-        url.searchParams.append('page', page);
-        url.searchParams.append('limit', 50);
-        
-        if (searchQuery) {
-            url.searchParams.append('search', searchQuery);
-        }
-        
-        const response = await fetch(url);
-        const data = await response.json();
-        
-        if (clearMessages) {
-            elements.messagesList.innerHTML = '';
-        }
+        const data = await fetchPage(channelId, page);
+        if (generation !== virtualList.generation) return;
         
         if (data.messages.length === 0 && page === 1) {
+            elements.messagesList.classList.remove('virtual');
             elements.messagesList.innerHTML = `
                 <div class="welcome-message">
                     <i class="fas fa-inbox"></i>
@@ -243,32 +272,66 @@ async function loadMessages(channelId, page = 1, clearMessages = false) {
                 </div>
             `;
         } else {
-            data.messages.forEach(message => {
-                const messageElement = createMessageElement(message);
-                elements.messagesList.appendChild(messageElement);
-            });
+            virtualList.rows = data.messages;
+            virtualList.firstIndex = (page - 1) * PAGE_SIZE;
+            virtualList.hasBefore = page > 1;
+            virtualList.hasAfter = data.has_next;
+            renderVirtualList();
             
             // Scroll para o final se for a primeira página
             if (page === 1) {
-                elements.messagesList.scrollTop = elements.messagesList.scrollHeight;
+                elements.messagesContainer.scrollTop = elements.messagesContainer.scrollHeight;
             }
         }
         
-        currentPage = page;
-        
     } catch (error) {
         console.error('Erro ao carregar mensagens:', error);
         showError('Erro ao carregar mensagens');
     } finally {
-        isLoading = false;
-        elements.loading.style.display = 'none';
+        if (generation === virtualList.generation) {
+            isLoading = false;
+            elements.loading.style.display = 'none';
+        }
+    }
+}
+
+// Buscar uma página de mensagens (ordem cronológica)
+async function fetchPage(channelId, page) {
+    const url = new URL(`${window.location.origin}${API_BASE}/messages/${channelId}`);
+    url.searchParams.append('page', page);
+    url.searchParams.append('limit', PAGE_SIZE);
+    
+    if (searchQuery) {
+        url.searchParams.append('search', searchQuery);
+    }
+    
+    const response = await fetch(url);
+    return response.json();
+}
+
+// Buscar mensagens ao redor de um alvo (message_id, timestamp ou cursor)
+async function fetchAround(channelId, params, before, after) {
+    const url = new URL(`${window.location.origin}${API_BASE}/messages/${channelId}/around`);
+    Object.entries(params).forEach(([key, value]) => url.searchParams.append(key, value));
+    url.searchParams.append('before', before);
+    url.searchParams.append('after', after);
+    
+    const response = await fetch(url);
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Mensagem não encontrada');
     }
+    return data;
 }
 
 // Criar elemento de mensagem
 function createMessageElement(message) {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'message';
+    messageDiv.setAttribute('data-message-id', message.id);
+    if (message.id === virtualList.highlightId) {
+        messageDiv.classList.add('highlighted');
+    }
     
     // Determinar se é mensagem própria (você pode ajustar esta lógica)
     const isOwnMessage = message.is_bot || message.username === 'Backup Viewer';
@@ -333,8 +396,21 @@ function createMediaElement(message) {
     if (message.message_type === 'image') {
         const img = document.createElement('img');
         img.className = 'message-image';
-        img.src = message.media_url;
         img.alt = message.media_filename || 'Imagem';
+        img.loading = 'lazy';
+        
+        // Na lista vai só a miniatura; o original é carregado no modal
+        img.src = message.thumbnail_url || message.media_url;
+        if (message.placeholder) {
+            img.style.backgroundImage = `url("${message.placeholder}")`;
+        }
+        if (message.media_width && message.media_height) {
+            // Reserva o espaço final para a altura da linha não mudar ao carregar
+            const scale = Math.min(1, 400 / message.media_width, 300 / message.media_height);
+            img.width = Math.round(message.media_width * scale);
+            img.height = Math.round(message.media_height * scale);
+        }
+
         img.addEventListener('click', () => openMediaModal(message.media_url, 'image'));
         mediaDiv.appendChild(img);
     } else if (message.message_type === 'audio') {
@@ -393,21 +469,382 @@ function toggleSearch() {
 function performSearch() {
     searchQuery = elements.searchInput.value.trim();
     if (currentChannelId) {
-        currentPage = 1;
         loadMessages(currentChannelId, 1, true);
     }
 }
 
-// Handle scroll para paginação
-function handleScroll() {
-    const container = elements.messagesList;
-    if (container.scrollTop + container.clientHeight >= container.scrollHeight - 100) {
-        if (currentChannelId && !isLoading) {
-            loadMessages(currentChannelId, currentPage + 1, false);
+// Carregar janela de mensagens ao redor de um alvo (jump-to)
+async function loadAround(channelId, params) {
+    isLoading = true;
+    elements.loading.style.display = 'flex';
+    // Invalida carregamentos em andamento, mas mantém a lista atual na tela
+    // até o alvo ser encontrado: um jump que falha não apaga a conversa
+    let generation = ++virtualList.generation;
+    
+    try {
+        const data = await fetchAround(channelId, params, JUMP_WINDOW, JUMP_WINDOW);
+        if (generation !== virtualList.generation) return;
+        
+        generation = resetVirtualList('cursor');
+        virtualList.rows = data.messages;
+        virtualList.hasBefore = data.has_before;
+        virtualList.hasAfter = data.has_after;
+        virtualList.highlightId = data.target_id;
+        renderVirtualList();
+        scrollToMessage(data.target_id);
+        
+    } catch (error) {
+        console.error('Erro ao navegar nas mensagens:', error);
+        showError(error.message || 'Erro ao carregar mensagens');
+    } finally {
+        if (generation === virtualList.generation) {
+            isLoading = false;
+            elements.loading.style.display = 'none';
+        }
+    }
+}
+
+// Ir para uma mensagem específica (id do Discord)
+function jumpToMessage(channelId, discordMessageId) {
+    return loadAround(channelId, { message_id: discordMessageId });
+}
+
+// Ir para a primeira mensagem a partir de uma data (YYYY-MM-DD, fuso local)
+function jumpToDate(channelId, dateString) {
+    const timestamp = new Date(`${dateString}T00:00:00`).toISOString();
+    return loadAround(channelId, { timestamp });
+}
+
+// Toggle jump-to por data
+function toggleJump() {
+    const isVisible = elements.jumpBar.style.display !== 'none';
+    elements.jumpBar.style.display = isVisible ? 'none' : 'flex';
+    
+    if (!isVisible) {
+        elements.jumpDateInput.focus();
+    }
+}
+
+// Realizar jump-to por data
+function performJump() {
+    const dateString = elements.jumpDateInput.value;
+    if (currentChannelId && dateString) {
+        jumpToDate(currentChannelId, dateString);
+    }
+}
+
+// Lista virtualizada: só as linhas visíveis (mais um buffer) ficam no DOM.
+// Blocos distantes são descartados da memória e guardados apenas como
+// {count, height}; quando voltam à tela são buscados de novo na API.
+
+// Reiniciar a lista para um novo canal, busca ou jump-to
+function resetVirtualList(mode) {
+    const list = virtualList;
+    list.generation += 1;
+    list.mode = mode;
+    list.rows = [];
+    list.firstIndex = 0;
+    list.hasBefore = false;
+    list.hasAfter = false;
+    list.evictedAbove = [];
+    list.evictedBelow = [];
+    list.heights.clear();
+    list.rendered.clear();
+    list.highlightId = null;
+    
+    list.topSpacer = document.createElement('div');
+    list.topSpacer.className = 'virtual-spacer';
+    list.bottomSpacer = document.createElement('div');
+    list.bottomSpacer.className = 'virtual-spacer';
+    
+    elements.messagesList.innerHTML = '';
+    elements.messagesList.classList.add('virtual');
+    elements.messagesList.appendChild(list.topSpacer);
+    elements.messagesList.appendChild(list.bottomSpacer);
+    
+    return list.generation;
+}
+
+// Altura de uma linha (medida, ou estimada se ainda não foi renderizada)
+function rowHeight(message) {
+    return virtualList.heights.get(message.id) || ESTIMATED_ROW_HEIGHT;
+}
+
+function sumRowHeights(messages) {
+    return messages.reduce((total, message) => total + rowHeight(message), 0);
+}
+
+function sumBlockHeights(blocks) {
+    return blocks.reduce((total, block) => total + block.height, 0);
+}
+
+// Calcular quais linhas carregadas estão dentro da área visível + buffer
+function computeVisibleRange() {
+    const list = virtualList;
+    const container = elements.messagesContainer;
+    const base = list.topSpacer.offsetTop + sumBlockHeights(list.evictedAbove);
+    const viewTop = container.scrollTop - base - RENDER_BUFFER_PX;
+    const viewBottom = container.scrollTop + container.clientHeight - base + RENDER_BUFFER_PX;
+    
+    let first = list.rows.length;
+    let last = -1;
+    let offset = 0;
+    let firstOffset = 0;
+    
+    for (let i = 0; i < list.rows.length; i++) {
+        const height = rowHeight(list.rows[i]);
+        if (offset + height > viewTop && offset < viewBottom) {
+            if (first > i) {
+                first = i;
+                firstOffset = offset;
+            }
+            last = i;
+        }
+        offset += height;
+    }
+    
+    return { first, last, firstOffset, totalHeight: offset, visibleTop: viewTop + RENDER_BUFFER_PX };
+}
+
+// Sincronizar o DOM com as linhas visíveis, reciclando os nós que saíram
+function syncRenderedRows(range) {
+    const list = virtualList;
+    const visible = list.rows.slice(range.first, range.last + 1);
+    const visibleIds = new Set(visible.map(message => message.id));
+    
+    list.rendered.forEach((node, id) => {
+        if (!visibleIds.has(id)) {
+            node.remove();
+            list.rendered.delete(id);
+            list.pool.push(node);
+        }
+    });
+    
+    let cursor = list.topSpacer.nextSibling;
+    visible.forEach(message => {
+        let node = list.rendered.get(message.id);
+        if (!node) {
+            node = list.pool.pop() || document.createElement('div');
+            node.className = 'virtual-row';
+            node.replaceChildren(createMessageElement(message));
+            // Imagens mudam a altura da linha depois de carregar
+            node.querySelectorAll('img').forEach(img => {
+                img.addEventListener('load', scheduleRender, { once: true });
+            });
+            list.rendered.set(message.id, node);
+        }
+        if (node === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            elements.messagesList.insertBefore(node, cursor);
+        }
+    });
+    
+    const visibleHeight = sumRowHeights(visible);
+    list.topSpacer.style.height = `${sumBlockHeights(list.evictedAbove) + range.firstOffset}px`;
+    list.bottomSpacer.style.height = `${range.totalHeight - range.firstOffset - visibleHeight + sumBlockHeights(list.evictedBelow)}px`;
+}
+
+// Renderizar a janela visível e atualizar o cache de alturas medidas
+function renderVirtualList() {
+    const list = virtualList;
+    if (!list.topSpacer || !list.topSpacer.isConnected) return;
+    
+    let range = computeVisibleRange();
+    syncRenderedRows(range);
+    
+    // Mede as linhas renderizadas; diferenças acima da área visível são
+    // compensadas no scroll para o conteúdo não "pular"
+    let changed = false;
+    let scrollDelta = 0;
+    let offset = range.firstOffset;
+    for (let i = range.first; i <= range.last; i++) {
+        const message = list.rows[i];
+        const previous = rowHeight(message);
+        const measured = list.rendered.get(message.id).offsetHeight;
+        if (measured && measured !== previous) {
+            list.heights.set(message.id, measured);
+            changed = true;
+            if (offset + previous <= range.visibleTop) {
+                scrollDelta += measured - previous;
+            }
+        }
+        offset += previous;
+    }
+    
+    if (changed) {
+        range = computeVisibleRange();
+        syncRenderedRows(range);
+        elements.messagesContainer.scrollTop += scrollDelta;
+    }
+    
+    return range;
+}
+
+// Agendar renderização no próximo frame (scroll, resize, imagens)
+function scheduleRender() {
+    if (renderFrame) return;
+    renderFrame = requestAnimationFrame(() => {
+        renderFrame = null;
+        const range = renderVirtualList();
+        if (range) {
+            loadVisibleNeighbours(range);
+        }
+    });
+}
+
+// Buscar mais mensagens quando a área visível se aproxima das bordas
+function loadVisibleNeighbours(range) {
+    const list = virtualList;
+    if (!currentChannelId || isLoading) return;
+    
+    if (range.first < LOAD_THRESHOLD_ROWS && (list.evictedAbove.length || list.hasBefore)) {
+        loadBefore();
+    } else if (range.last >= list.rows.length - LOAD_THRESHOLD_ROWS && (list.evictedBelow.length || list.hasAfter)) {
+        loadAfter();
+    }
+}
+
+// Carregar o bloco anterior à primeira mensagem da janela
+async function loadBefore() {
+    const list = virtualList;
+    if (isLoading || !list.rows.length) return;
+    
+    isLoading = true;
+    const generation = list.generation;
+    const placeholder = list.evictedAbove[list.evictedAbove.length - 1];
+    
+    try {
+        let messages;
+        let hasMore;
+        if (list.mode === 'page') {
+            const page = list.firstIndex / PAGE_SIZE;
+            if (page < 1) return;
+            const data = await fetchPage(currentChannelId, page);
+            messages = data.messages;
+            hasMore = page > 1;
+        } else {
+            const count = placeholder ? placeholder.count : JUMP_WINDOW;
+            const data = await fetchAround(currentChannelId, { cursor: list.rows[0].id }, count, 0);
+            messages = data.messages;
+            hasMore = data.has_before;
+        }
+        if (generation !== list.generation) return;
+        
+        if (placeholder) {
+            list.evictedAbove.pop();
+        }
+        list.rows = messages.concat(list.rows);
+        list.firstIndex -= messages.length;
+        list.hasBefore = hasMore;
+        
+        // Preserva a posição visível: o bloco real substitui o espaço reservado
+        const delta = sumRowHeights(messages) - (placeholder ? placeholder.height : 0);
+        const topHeight = parseFloat(list.topSpacer.style.height) || 0;
+        list.topSpacer.style.height = `${topHeight + delta}px`;
+        elements.messagesContainer.scrollTop += delta;
+        
+        evictFarRows('bottom');
+        renderVirtualList();
+        
+    } catch (error) {
+        console.error('Erro ao carregar mensagens anteriores:', error);
+    } finally {
+        if (generation === list.generation) {
+            isLoading = false;
+        }
+    }
+}
+
+// Carregar o bloco seguinte à última mensagem da janela
+async function loadAfter() {
+    const list = virtualList;
+    if (isLoading || !list.rows.length) return;
+    
+    isLoading = true;
+    const generation = list.generation;
+    const placeholder = list.evictedBelow[list.evictedBelow.length - 1];
+    
+    try {
+        let messages;
+        let hasMore;
+        if (list.mode === 'page') {
+            const page = (list.firstIndex + list.rows.length) / PAGE_SIZE + 1;
+            const data = await fetchPage(currentChannelId, page);
+            messages = data.messages;
+            hasMore = data.has_next;
+        } else {
+            const count = placeholder ? placeholder.count : JUMP_WINDOW;
+            const data = await fetchAround(currentChannelId, { cursor: list.rows[list.rows.length - 1].id }, 0, count);
+            messages = data.messages;
+            hasMore = data.has_after;
+        }
+        if (generation !== list.generation) return;
+        
+        if (placeholder) {
+            list.evictedBelow.pop();
+        }
+        list.rows = list.rows.concat(messages);
+        list.hasAfter = hasMore;
+        
+        evictFarRows('top');
+        renderVirtualList();
+        
+    } catch (error) {
+        console.error('Erro ao carregar mais mensagens:', error);
+    } finally {
+        if (generation === list.generation) {
+            isLoading = false;
         }
     }
 }
 
+// Descartar da memória os blocos mais distantes da área visível
+function evictFarRows(side) {
+    const list = virtualList;
+    
+    while (list.rows.length > MAX_LOADED_ROWS) {
+        let removed;
+        if (side === 'top') {
+            removed = list.rows.splice(0, PAGE_SIZE);
+            list.firstIndex += removed.length;
+            list.evictedAbove.push({ count: removed.length, height: sumRowHeights(removed) });
+        } else {
+            // No modo página o fim da janela continua alinhado às páginas
+            const end = list.firstIndex + list.rows.length;
+            const count = list.mode === 'page' ? (end % PAGE_SIZE || PAGE_SIZE) : PAGE_SIZE;
+            removed = list.rows.splice(list.rows.length - count, count);
+            list.evictedBelow.push({ count: removed.length, height: sumRowHeights(removed) });
+        }
+        
+        removed.forEach(message => {
+            const node = list.rendered.get(message.id);
+            if (node) {
+                node.remove();
+                list.rendered.delete(message.id);
+                list.pool.push(node);
+            }
+        });
+    }
+}
+
+// Rolar até uma mensagem carregada, centralizando-a na tela
+function scrollToMessage(id) {
+    const list = virtualList;
+    const container = elements.messagesContainer;
+    const index = list.rows.findIndex(message => message.id === id);
+    if (index < 0) return;
+    
+    const offset = list.topSpacer.offsetTop + sumBlockHeights(list.evictedAbove) + sumRowHeights(list.rows.slice(0, index));
+    container.scrollTop = offset - (container.clientHeight - rowHeight(list.rows[index])) / 2;
+    renderVirtualList();
+}
+
+// Handle scroll para paginação
+function handleScroll() {
+    scheduleRender();
+}
+
 // Abrir modal de mídia
 function openMediaModal(mediaUrl, mediaType) {
     elements.modalBody.innerHTML = '';
@@ -438,6 +875,9 @@ function showError(message) {
 
 // Utilitários para desenvolvimento/teste
 window.DiscordBackup = {
+    jumpToMessage,
+    jumpToDate,
+    
     // Função para adicionar mensagens de teste
     addTestMessage: async function(channelId, messageData) {
         try {
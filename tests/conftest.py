@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db
+from src.models.shard import router
+from src.routes.discord import discord_bp
+
+
+@pytest.fixture
+def api(tmp_path):
+    """App com o catálogo e os shards em ``tmp_path`` e as rotas da API"""
+    app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {'media': f"sqlite:///{tmp_path / 'media.db'}"}
+    app.config['SHARD_DIRECTORY'] = str(tmp_path / 'shards')
+    app.register_blueprint(discord_bp, url_prefix='/api')
+    db.init_app(app)
+    router.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+    router.dispose()
+
+
+@pytest.fixture
+def client(api):
+    return api.test_client()
+
+
+def post_message(client, number, server_id='s1', channel_id='c1', timestamp=None, content=None):
+    """Grava uma mensagem pela API, como o bot faz"""
+    response = client.post('/api/messages', json={
+        'discord_message_id': f'{server_id}-{number}',
+        'user_id': 'u1',
+        'username': 'Usuário',
+        'content': content if content is not None else f'mensagem {number}',
+        'timestamp': timestamp or f'2024-01-01T00:{number // 60:02d}:{number % 60:02d}',
+        'channel_id': channel_id,
+        'channel_name': f'canal-{channel_id}',
+        'server_id': server_id,
+        'server_name': f'Servidor {server_id}'
+    })
+    assert response.status_code in (200, 201)
+    return response.get_json()
@@ -0,0 +1,324 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db
+from src.models.message import Message
+from src.models.media import MediaFile, mirror
+import src.models.media as media_module
+from src.routes.discord import serialize_messages
+
+
+class StandInCDN:
+    """Servidor HTTP local que faz o papel da CDN do Discord.
+
+    ``routes`` mapeia caminho -> lista de respostas ``(status, corpo)`` ou
+    ``(status, corpo, content_type)`` servidas em ordem (a última se
+    repete). ``hits`` conta os acessos.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = {}
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cdn.hits[self.path] = cdn.hits.get(self.path, 0) + 1
+                responses = cdn.routes.get(self.path, [(404, b'')])
+                status, body, *content_type = responses[min(cdn.hits[self.path], len(responses)) - 1]
+                self.send_response(status)
+                if status in (301, 302):
+                    self.send_header('Location', body.decode())
+                    body = b''
+                self.send_header('Content-Type', content_type[0] if content_type else 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def cdn():
+    server = StandInCDN()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {'media': f"sqlite:///{tmp_path / 'media.db'}"}
+    app.config['MEDIA_ALLOWED_HOSTS'] = ['127.0.0.1']
+    app.config['MEDIA_BLOCK_PRIVATE_ADDRESSES'] = False
+    app.config['MEDIA_RETRY_BACKOFF'] = 0
+    app.config['MEDIA_TIMEOUT'] = 5
+    db.init_app(app)
+    mirror.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+    mirror.shutdown()
+
+
+def fetch(url, kind='avatar'):
+    future = mirror.enqueue(url, kind)
+    assert future is not None
+    return future.result(timeout=10)
+
+
+def row_for(url):
+    db.session.expire_all()
+    return MediaFile.query.filter_by(url=url).first()
+
+
+def test_url_is_downloaded_once(app, cdn):
+    cdn.routes['/a.png'] = [(200, b'a' * 100)]
+    url = cdn.url('/a.png')
+
+    fetch(url)
+    fetch(url)
+    mirror.resolve([url])
+    mirror.shutdown()
+
+    assert cdn.hits['/a.png'] == 1
+    assert row_for(url).status == 'ready'
+
+
+def test_same_content_shares_one_file(app, cdn):
+    cdn.routes['/one.png'] = [(200, b'same bytes')]
+    cdn.routes['/two.png'] = [(200, b'same bytes')]
+
+    fetch(cdn.url('/one.png'))
+    fetch(cdn.url('/two.png'))
+
+    one, two = row_for(cdn.url('/one.png')), row_for(cdn.url('/two.png'))
+    assert one.filename == two.filename
+    assert one.sha256 == two.sha256
+    files = [name for _, _, names in os.walk(app.config['MEDIA_DIRECTORY']) for name in names]
+    assert len(files) == 1
+
+
+@pytest.mark.parametrize('status', [500, 503, 429])
+def test_retries_with_backoff(app, cdn, monkeypatch, status):
+    delays = []
+    monkeypatch.setattr(media_module.time, 'sleep', delays.append)
+    app.config['MEDIA_RETRY_BACKOFF'] = 0.5
+    cdn.routes['/flaky.png'] = [(status, b''), (status, b''), (200, b'ok')]
+
+    fetch(cdn.url('/flaky.png'))
+
+    assert cdn.hits['/flaky.png'] == 3
+    assert delays == [0.5, 1.0]
+    assert row_for(cdn.url('/flaky.png')).status == 'ready'
+
+
+def test_gives_up_after_max_retries(app, cdn):
+    cdn.routes['/down.png'] = [(500, b'')]
+
+    fetch(cdn.url('/down.png'))
+
+    assert cdn.hits['/down.png'] == app.config['MEDIA_RETRIES']
+    assert row_for(cdn.url('/down.png')).status == 'failed'
+
+
+def test_no_retry_on_not_found(app, cdn):
+    fetch(cdn.url('/missing.png'))
+
+    assert cdn.hits['/missing.png'] == 1
+    row = row_for(cdn.url('/missing.png'))
+    assert row.status == 'failed'
+    assert row.attempts == 1
+
+
+def test_respects_max_file_size(app, cdn):
+    app.config['MEDIA_MAX_FILE_SIZE'] = 1000
+    cdn.routes['/big.png'] = [(200, b'x' * 1001)]
+    cdn.routes['/fits.png'] = [(200, b'x' * 1000)]
+
+    fetch(cdn.url('/big.png'))
+    fetch(cdn.url('/fits.png'))
+
+    assert row_for(cdn.url('/big.png')).status == 'failed'
+    assert row_for(cdn.url('/fits.png')).status == 'ready'
+    assert cdn.hits['/big.png'] == 1
+
+
+def test_lru_evicts_least_recently_used_avatars(app, cdn):
+    app.config['MEDIA_CACHE_MAX_BYTES'] = 2500
+    for name in ('old', 'mid', 'new'):
+        cdn.routes[f'/{name}.png'] = [(200, name[0].encode() * 1000)]
+
+    fetch(cdn.url('/old.png'))
+    fetch(cdn.url('/mid.png'))
+    old = row_for(cdn.url('/old.png'))
+    old_path = os.path.join(app.config['MEDIA_DIRECTORY'], old.filename)
+    assert os.path.exists(old_path)
+
+    fetch(cdn.url('/new.png'))
+
+    assert row_for(cdn.url('/old.png')).status == 'evicted'
+    assert not os.path.exists(old_path)
+    assert row_for(cdn.url('/mid.png')).status == 'ready'
+    assert row_for(cdn.url('/new.png')).status == 'ready'
+
+
+def test_eviction_scan_runs_only_over_budget(app, cdn, monkeypatch):
+    calls = []
+    evict = mirror._evict
+    monkeypatch.setattr(mirror, '_evict', lambda keep=None: calls.append(keep) or evict(keep))
+    app.config['MEDIA_CACHE_MAX_BYTES'] = 2500
+    for name in ('old', 'mid', 'new'):
+        cdn.routes[f'/{name}.png'] = [(200, name[0].encode() * 1000)]
+
+    fetch(cdn.url('/old.png'))
+    fetch(cdn.url('/mid.png'))
+    assert len(calls) == 1  # só a medição inicial
+
+    fetch(cdn.url('/new.png'))
+    assert len(calls) == 2
+    assert mirror._cache_bytes == 2000
+
+
+def test_media_table_lives_outside_the_catalog(app, cdn):
+    cdn.routes['/a.png'] = [(200, b'a')]
+    fetch(cdn.url('/a.png'))
+
+    with db.engines['media'].connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+    assert 'media_files' not in db.inspect(db.engine).get_table_names()
+
+
+def test_attachments_are_never_evicted(app, cdn):
+    app.config['MEDIA_CACHE_MAX_BYTES'] = 1500
+    cdn.routes['/attachment.png'] = [(200, b'a' * 1000)]
+    cdn.routes['/avatar1.png'] = [(200, b'b' * 1000)]
+    cdn.routes['/avatar2.png'] = [(200, b'c' * 1000)]
+
+    fetch(cdn.url('/attachment.png'), kind='attachment')
+    fetch(cdn.url('/avatar1.png'))
+    fetch(cdn.url('/avatar2.png'))
+
+    assert row_for(cdn.url('/attachment.png')).status == 'ready'
+    assert row_for(cdn.url('/avatar1.png')).status == 'evicted'
+    assert row_for(cdn.url('/avatar2.png')).status == 'ready'
+
+
+def test_serialize_messages_rewrites_ready_urls(app, cdn):
+    cdn.routes['/avatar.png'] = [(200, b'avatar')]
+    cdn.routes['/photo.png'] = [(200, b'photo')]
+    avatar_url, media_url = cdn.url('/avatar.png'), cdn.url('/photo.png')
+    message = Message(
+        id=1, discord_message_id='1', user_id='u', username='n',
+        avatar_url=avatar_url, media_url=media_url, message_type='image',
+        channel_id='c', channel_name='g', server_id='s', server_name='S'
+    )
+
+    # Antes de ficar pronto a URL original é mantida
+    item = serialize_messages([message])[0]
+    assert item['avatar_url'] == avatar_url
+    mirror.shutdown()
+
+    item = serialize_messages([message])[0]
+    assert item['avatar_url'] == f"/media/{row_for(avatar_url).filename}"
+    assert item['media_url'] == f"/media/{row_for(media_url).filename}"
+    assert row_for(media_url).kind == 'attachment'
+
+
+def test_rejects_hosts_outside_allow_list(app, cdn):
+    app.config['MEDIA_ALLOWED_HOSTS'] = ['cdn.discordapp.com']
+    cdn.routes['/a.png'] = [(200, b'a')]
+
+    assert mirror.enqueue(cdn.url('/a.png')) is None
+    assert mirror.resolve([cdn.url('/a.png')]) == {}
+    assert '/a.png' not in cdn.hits
+
+
+def test_blocks_private_addresses(app, cdn):
+    app.config['MEDIA_BLOCK_PRIVATE_ADDRESSES'] = True
+    cdn.routes['/a.png'] = [(200, b'a')]
+
+    fetch(cdn.url('/a.png'))
+
+    assert row_for(cdn.url('/a.png')).status == 'failed'
+    assert '/a.png' not in cdn.hits
+
+
+def test_blocks_redirect_to_disallowed_host(app, cdn):
+    cdn.routes['/redirect.png'] = [(302, b'http://169.254.169.254/latest/meta-data')]
+
+    fetch(cdn.url('/redirect.png'))
+
+    assert row_for(cdn.url('/redirect.png')).status == 'failed'
+    assert cdn.hits['/redirect.png'] == 1
+
+
+@pytest.mark.parametrize('path, content_type', [
+    ('/evil.html', 'text/html'),
+    ('/evil.png', 'text/html'),
+    ('/evil.svg', 'image/svg+xml'),
+    ('/evil.html', 'image/png'),
+])
+def test_rejects_types_outside_allowed_extensions(app, cdn, path, content_type):
+    cdn.routes[path] = [(200, b'<script>alert(1)</script>', content_type)]
+
+    fetch(cdn.url(path), kind='attachment')
+
+    row = row_for(cdn.url(path))
+    assert row.status == 'failed'
+    assert row.filename is None
+    assert not any(names for _, _, names in os.walk(app.config['MEDIA_DIRECTORY']))
+
+
+def test_extension_comes_from_content_type_when_url_has_none(app, cdn):
+    cdn.routes['/attachment'] = [(200, b'jpeg bytes', 'image/jpeg')]
+
+    fetch(cdn.url('/attachment'), kind='attachment')
+
+    row = row_for(cdn.url('/attachment'))
+    assert row.status == 'ready'
+    assert row.filename.endswith('.jpg')
+
+
+def test_eviction_removes_preview_files(app, cdn, monkeypatch):
+    from src.models.preview import previews
+    monkeypatch.setattr(previews, 'app', app)
+    monkeypatch.setattr(previews, 'static_folder', app.static_folder)
+    app.config.setdefault('PREVIEW_URL_PREFIX', '/thumbs')
+    app.config['MEDIA_CACHE_MAX_BYTES'] = 1500
+    cdn.routes['/old.png'] = [(200, b'o' * 1000)]
+    cdn.routes['/new.png'] = [(200, b'n' * 1000)]
+
+    fetch(cdn.url('/old.png'))
+    url = f"/media/{row_for(cdn.url('/old.png')).filename}"
+    _, thumbnail_path, metadata_path = previews._paths(url)
+    os.makedirs(os.path.dirname(thumbnail_path))
+    for path in (thumbnail_path, metadata_path):
+        with open(path, 'w') as f:
+            f.write('x')
+
+    fetch(cdn.url('/new.png'))
+
+    assert row_for(cdn.url('/old.png')).status == 'evicted'
+    assert not os.path.exists(thumbnail_path)
+    assert not os.path.exists(metadata_path)
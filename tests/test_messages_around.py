@@ -0,0 +1,118 @@
+import pytest
+
+from src.routes.discord import AROUND_MAX
+from conftest import post_message
+
+
+@pytest.fixture
+def channel(client):
+    """Canal c1 (servidor s1) com 10 mensagens, uma por segundo"""
+    for number in range(10):
+        post_message(client, number)
+    return 'c1'
+
+
+def around(client, channel_id, **params):
+    response = client.get(f'/api/messages/{channel_id}/around', query_string=params)
+    return response.status_code, response.get_json()
+
+
+def numbers(data):
+    return [int(m['discord_message_id'].rsplit('-', 1)[1]) for m in data['messages']]
+
+
+def test_window_around_message_id(client, channel):
+    status, data = around(client, channel, message_id='s1-5', before=2, after=3)
+
+    assert status == 200
+    assert numbers(data) == [3, 4, 5, 6, 7, 8]
+    assert data['target_id'] == data['messages'][2]['id']
+    assert data['has_before'] and data['has_after']
+    assert data['before_cursor'] == data['messages'][0]['id']
+    assert data['after_cursor'] == data['messages'][-1]['id']
+
+
+def test_has_before_and_after_stop_at_channel_edges(client, channel):
+    _, data = around(client, channel, message_id='s1-1', before=1, after=8)
+    assert numbers(data) == list(range(10))
+    assert not data['has_before']
+    assert not data['has_after']
+
+    _, data = around(client, channel, message_id='s1-1', before=0, after=7)
+    assert numbers(data) == list(range(1, 9))
+    assert data['has_before']
+    assert data['has_after']
+
+
+def test_equal_timestamps_are_ordered_by_id(client):
+    for number in range(5):
+        post_message(client, number, timestamp='2024-01-01T12:00:00')
+
+    _, data = around(client, 'c1', message_id='s1-2', before=1, after=1)
+
+    assert numbers(data) == [1, 2, 3]
+    assert data['has_before'] and data['has_after']
+
+
+def test_cursor_is_exclusive(client, channel):
+    _, data = around(client, channel, message_id='s1-5', before=0, after=0)
+    cursor = data['target_id']
+
+    _, older = around(client, channel, cursor=cursor, before=2, after=0)
+    _, newer = around(client, channel, cursor=cursor, before=0, after=2)
+
+    assert numbers(older) == [3, 4]
+    assert numbers(newer) == [6, 7]
+    assert older['has_before'] and newer['has_after']
+    assert cursor not in [m['id'] for m in older['messages'] + newer['messages']]
+
+
+def test_cursor_with_empty_window_returns_the_cursor(client, channel):
+    _, data = around(client, channel, message_id='s1-9', before=0, after=0)
+
+    _, newer = around(client, channel, cursor=data['target_id'], before=0, after=5)
+
+    assert newer['messages'] == []
+    assert not newer['has_after']
+    assert newer['before_cursor'] == newer['after_cursor'] == data['target_id']
+
+
+def test_timestamp_targets_first_message_at_or_after_it(client, channel):
+    _, data = around(client, channel, timestamp='2024-01-01T00:00:04.500', before=1, after=1)
+    assert numbers(data) == [4, 5, 6]
+
+    # Fusos são convertidos para UTC, como os timestamps gravados
+    _, data = around(client, channel, timestamp='2023-12-31T21:00:07-03:00', before=0, after=0)
+    assert numbers(data) == [7]
+
+
+def test_timestamp_past_the_end_falls_back_to_last_message(client, channel):
+    _, data = around(client, channel, timestamp='2030-01-01T00:00:00Z', before=2, after=2)
+
+    assert numbers(data) == [7, 8, 9]
+    assert data['target_id'] == data['messages'][-1]['id']
+    assert not data['has_after']
+
+
+def test_window_size_is_clamped(client, channel):
+    _, data = around(client, channel, message_id='s1-5', before=-3, after=AROUND_MAX + 50)
+
+    assert numbers(data) == [5, 6, 7, 8, 9]
+    assert data['has_before']
+
+
+def test_finds_channel_shard_through_catalog(client):
+    post_message(client, 1, server_id='s1', channel_id='c1')
+    post_message(client, 1, server_id='s2', channel_id='c2')
+
+    _, data = around(client, 'c2', message_id='s2-1')
+
+    assert [m['server_id'] for m in data['messages']] == ['s2']
+
+
+def test_bad_requests(client, channel):
+    assert around(client, channel)[0] == 400
+    assert around(client, channel, timestamp='ontem')[0] == 400
+    assert around(client, 'unknown', message_id='s1-1')[0] == 404
+    assert around(client, channel, message_id='missing')[0] == 404
+    assert around(client, channel, cursor=999)[0] == 404
@@ -0,0 +1,69 @@
+import logging
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from PIL import Image
+from src.models.preview import previews
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # O gerador é global: restaura o estado anterior ao final
+    monkeypatch.setattr(previews, 'app', None)
+    monkeypatch.setattr(previews, 'static_folder', None)
+    monkeypatch.setattr(previews, '_cache', OrderedDict())
+    app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+    previews.init_app(app)
+    os.makedirs(os.path.join(app.static_folder, 'uploads', 'images'))
+    yield app
+    previews.shutdown()
+
+
+def image_path(app, name):
+    return os.path.join(app.static_folder, 'uploads', 'images', name)
+
+
+def test_generates_thumbnail_and_placeholder(app):
+    Image.new('RGB', (1600, 900), (200, 30, 30)).save(image_path(app, 'photo.png'))
+
+    previews.submit('/uploads/images/photo.png').result(timeout=60)
+    preview = previews.describe('/uploads/images/photo.png')
+
+    assert preview['thumbnail_url'] == '/thumbs/uploads/images/photo.png.webp'
+    assert preview['placeholder'].startswith('data:image/jpeg;base64,')
+    assert (preview['media_width'], preview['media_height']) == (1600, 900)
+    with Image.open(os.path.join(app.static_folder, 'thumbs/uploads/images/photo.png.webp')) as thumbnail:
+        assert max(thumbnail.size) == app.config['PREVIEW_THUMBNAIL_SIZE']
+
+
+def test_animated_gif_keeps_the_original(app):
+    frames = [Image.new('RGB', (120, 80), color) for color in ((255, 0, 0), (0, 255, 0), (0, 0, 255))]
+    frames[0].save(image_path(app, 'dance.gif'), save_all=True, append_images=frames[1:], duration=100)
+
+    previews.submit('/uploads/images/dance.gif').result(timeout=60)
+    preview = previews.describe('/uploads/images/dance.gif')
+
+    # Sem miniatura a lista usa o GIF original, mas mantém placeholder e dimensões
+    assert preview['thumbnail_url'] is None
+    assert preview['placeholder'].startswith('data:image/jpeg;base64,')
+    assert (preview['media_width'], preview['media_height']) == (120, 80)
+    assert not os.path.exists(os.path.join(app.static_folder, 'thumbs/uploads/images/dance.gif.webp'))
+
+
+def test_failures_are_logged(app, caplog):
+    with open(image_path(app, 'broken.png'), 'wb') as f:
+        f.write(b'not an image')
+
+    future = previews.submit('/uploads/images/broken.png')
+    with caplog.at_level(logging.WARNING):
+        with pytest.raises(Exception):
+            future.result(timeout=60)
+        previews.shutdown()
+
+    assert 'Falha ao gerar a prévia de /uploads/images/broken.png' in caplog.text
@@ -0,0 +1,81 @@
+import os
+
+from src.models.message import Channel, Message
+from src.models.shard import router
+from conftest import post_message
+
+
+def test_messages_are_routed_to_their_server_shard(api, client):
+    post_message(client, 1, server_id='s1', channel_id='c1')
+    post_message(client, 2, server_id='s2', channel_id='c2')
+
+    assert router.server_ids() == ['s1', 's2']
+    for server_id in ('s1', 's2'):
+        with router.session(server_id, create=False) as session:
+            assert [m.server_id for m in session.query(Message)] == [server_id]
+    # O catálogo guarda só os canais
+    assert {c.discord_channel_id: c.server_id for c in Channel.query} == {'c1': 's1', 'c2': 's2'}
+
+
+def test_duplicate_message_is_not_stored_twice(client):
+    first = post_message(client, 1)
+    again = client.post('/api/messages', json={
+        'discord_message_id': first['discord_message_id'], 'user_id': 'u1', 'username': 'x',
+        'channel_id': 'c1', 'channel_name': 'canal-c1', 'server_id': 's1', 'server_name': 'S'
+    })
+
+    assert again.status_code == 200
+    with router.session('s1', create=False) as session:
+        assert session.query(Message).count() == 1
+
+
+def test_channel_messages_are_read_from_the_shard(client):
+    for number in range(3):
+        post_message(client, number, server_id='s1', channel_id='c1')
+    post_message(client, 9, server_id='s2', channel_id='c2')
+
+    data = client.get('/api/messages/c1?limit=2').get_json()
+
+    assert data['total'] == 3
+    assert data['pages'] == 2
+    assert [m['discord_message_id'] for m in data['messages']] == ['s1-0', 's1-1']
+
+
+def test_reads_do_not_create_shards(api, client):
+    data = client.get('/api/messages/unknown?server_id=ghost').get_json()
+    assert data['messages'] == []
+    assert client.get('/api/messages/unknown/around?server_id=ghost&cursor=1').status_code == 404
+    assert client.get('/api/search?q=x&server_id=ghost').get_json() == {'messages': []}
+
+    assert router.server_ids() == []
+    assert not os.path.exists(os.path.join(api.config['SHARD_DIRECTORY'], 'ghost.db'))
+
+
+def test_global_search_returns_unique_keys(client):
+    for number in range(3):
+        post_message(client, number, server_id='s1', channel_id='c1', content=f'olá {number}')
+        post_message(client, number, server_id='s2', channel_id='c2', content=f'olá {number}')
+
+    messages = client.get('/api/search?q=olá').get_json()['messages']
+
+    assert len(messages) == 6
+    # Os ids se repetem entre shards, mas a chave não
+    assert len({m['id'] for m in messages}) == 3
+    assert len({m['key'] for m in messages}) == 6
+    assert messages[0]['key'] in ('s1:3', 's2:3')
+
+
+def test_search_and_stats_can_be_limited_to_one_server(client):
+    post_message(client, 1, server_id='s1', channel_id='c1', content='olá')
+    post_message(client, 2, server_id='s1', channel_id='c1', content='olá')
+    post_message(client, 1, server_id='s2', channel_id='c2', content='olá')
+
+    messages = client.get('/api/search?q=olá&server_id=s2').get_json()['messages']
+    assert [m['key'] for m in messages] == ['s2:1']
+
+    assert client.get('/api/stats').get_json() == {
+        'total_messages': 3, 'total_channels': 2, 'total_servers': 2
+    }
+    assert client.get('/api/stats?server_id=s1').get_json() == {
+        'total_messages': 2, 'total_channels': 1, 'total_servers': 1
+    }